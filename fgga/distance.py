@@ -1,7 +1,25 @@
+import cmath
 import math
-import random
+from random import random as _rand
 
-def get_new_coordinates(lon, lat, dx, dy):
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖, 仅批量计算时需要
+    np = None
+
+# 地球半径，单位：米 (使用 WGS-84 椭球体赤道半径)
+EARTH_RADIUS = 6378137.0
+
+_DEG_PER_RAD = math.degrees(1.0)
+_TAU = 2.0 * math.pi
+# 纬度变化超过该值 (度) 时才重新计算 cos(纬度),
+# 经度步长的相对误差不超过 tan(纬度) * 1.75e-5
+_COS_REFRESH_DEG = 1e-3
+
+# 每米对应的弧长角度 (度)
+_DEG_PER_M = _DEG_PER_RAD / EARTH_RADIUS
+
+def get_new_coordinates(lon, lat, dx, dy, _cos=math.cos, _rad=math.radians, _deg_per_m=_DEG_PER_M):
     """
     根据给定的经纬度和移动距离（米），计算新的经纬度。
     
@@ -13,28 +31,65 @@ def get_new_coordinates(lon, lat, dx, dy):
     
     返回:
     (float, float): 新的 (经度, 纬度)
-    """
     
-    # 地球半径，单位：米 (使用 WGS-84 椭球体赤道半径)
-    earth_radius = 6378137.0
+    下划线开头的参数只用于把模块级名称绑定为局部变量, 调用时不要传入。
+    """
     
     # 1. 计算纬度的变化
     # 纬度每度的距离相对固定（约111公里），直接用弧长公式：L = R * θ
-    # 变换为：θ (弧度) = dy / R
-    d_lat_rad = dy / earth_radius
-    new_lat = lat + math.degrees(d_lat_rad)
+    # 变换为：θ (弧度) = dy / R, 再换算为度
+    new_lat = lat + dy * _deg_per_m
     
     # 2. 计算经度的变化
     # 经度每度的距离随纬度变化而变化（赤道最长，极点为0）
     # 经度圈半径 r = R * cos(纬度)
     # 变换为：θ (弧度) = dx / (R * cos(纬度))
-    avg_lat_rad = math.radians(lat)
-    d_lon_rad = dx / (earth_radius * math.cos(avg_lat_rad))
-    new_lon = lon + math.degrees(d_lon_rad)
+    new_lon = lon + dx * _deg_per_m / _cos(_rad(lat))
     
     return new_lon, new_lat
 
 
+def get_new_coordinates_vec(lon, lat, dx, dy):
+    """
+    get_new_coordinates 的 NumPy 批量版本，一次计算多个点 (需要安装 numpy)。
+    
+    参数:
+    lon (np.ndarray or float): 原始经度（度）
+    lat (np.ndarray or float): 原始纬度（度）
+    dx (np.ndarray or float): 东西方向移动距离（米）
+    dy (np.ndarray or float): 南北方向移动距离（米）
+    
+    返回:
+    (np.ndarray, np.ndarray): 新的 (经度, 纬度) 数组，按 NumPy 规则广播
+    """
+    d_lat = np.degrees(dy / EARTH_RADIUS)
+    d_lon = np.degrees(dx / (EARTH_RADIUS * np.cos(np.radians(lat))))
+    return lon + d_lon, lat + d_lat
+
+
+def make_stepper(lon0, lat0):
+    """
+    从 (lon0, lat0) 出发, 返回逐步移动的函数 step(dx, dy) -> (经度, 纬度)。
+    与反复调用 get_new_coordinates 等价, 但缓存 1/(R*cos(纬度)),
+    只在纬度变化超过 _COS_REFRESH_DEG 时才重新计算三角函数。
+    """
+    lon, lat = lon0, lat0
+    inv_r_deg = _DEG_PER_RAD / EARTH_RADIUS
+    cached_lat = lat
+    cached_inv_rcos = 1.0 / (EARTH_RADIUS * math.cos(math.radians(lat)))
+
+    def step(dx, dy):
+        nonlocal lon, lat, cached_lat, cached_inv_rcos
+        lon += dx * cached_inv_rcos * _DEG_PER_RAD
+        lat += dy * inv_r_deg
+        if abs(lat - cached_lat) > _COS_REFRESH_DEG:
+            cached_lat = lat
+            cached_inv_rcos = 1.0 / (EARTH_RADIUS * math.cos(math.radians(lat)))
+        return lon, lat
+
+    return step
+
+
 def get_random_displacement_components(distance):
     """
     输入直线绝对距离，输出随机的东西(dx)和南北(dy)位移。
@@ -51,12 +106,14 @@ def get_random_displacement_components(distance):
 
     # 1. 生成一个 0 到 360 度 (0 到 2π 弧度) 之间的随机角度
     # 这个角度决定了方向，从而随机决定了 dx 和 dy 的正负号
-    angle_rad = random.uniform(0, 2 * math.pi)
+    angle_rad = _TAU * _rand()
     
     # 2. 根据三角函数分解距离
     # cos 在 0-90°(第一象限)为正，90-180°(第二象限)为负...以此类推，自动处理正负
-    dx = distance * math.cos(angle_rad)
-    dy = distance * math.sin(angle_rad)
+    # cmath.rect 一次调用同时得到 distance*cos 和 distance*sin
+    z = cmath.rect(distance, angle_rad)
+    dx = z.real
+    dy = z.imag
     
     return dx, dy
 
@@ -1,11 +1,24 @@
 import re
 import logging
 import datetime
+import functools
+import operator
 
 
 logger = logging.getLogger("NMEA_Check")
 
+# 校验字段格式用的正则, 模块加载时编译一次
+_RE_TIME = re.compile(r'^\d{6}(\.\d+)?$')  # HHMMSS.ss
+_RE_LAT = re.compile(r'^\d{4}\.\d+$')  # DDMM.MMMM
+_RE_LON = re.compile(r'^\d{5}\.\d+$')  # DDDMM.MMMM
+_RE_POS_FLOAT = re.compile(r'^\d+(\.\d+)?$')  # HDOP, 差分龄期
+_RE_INT_OR_FLOAT = re.compile(r'^-?\d+(\.\d+)?$')  # 海拔, 大地水准面分离度
+
 class GGA:
+    # 实例会被长期复用并逐字段修改, 用 __slots__ 省去 __dict__
+    __slots__ = ('talker', 'utc_time', 'lat', 'lon', 'quality', 'num_sats',
+                 'hdop', 'alt', 'geo_sep', 'age_diff', 'ref_id')
+
     def __init__(self, talker="GP", utc_time=None, lat=None, lon=None, quality=0, num_sats=0):
         """
         初始化 GGA 语句对象
@@ -38,11 +51,12 @@ class GGA:
         if lat is None: return "", ""
         
         direction = 'N' if lat >= 0 else 'S'
-        abs_lat = abs(lat)
-        degrees = int(abs_lat)
-        minutes = (abs_lat - degrees) * 60
-        # 格式化: 2位度数 + 2位整数分 + 小数分
-        nmea_val = f"{degrees:02d}{minutes:09.6f}" # 09.6f 保证分钟显示足够的精度
+        # 以 1e-6 分为单位取整, 之后全部用整数运算拆分度和分
+        micro_min = int(abs(lat) * 60_000_000 + 0.5)
+        degrees, rem = divmod(micro_min, 60_000_000)
+        minutes, frac = divmod(rem, 1_000_000)
+        # 格式化: 2位度数 + 2位整数分 + 6位小数分 (整数的 % 格式化比带格式说明的 f-string 快)
+        nmea_val = "%02d%02d.%06d" % (degrees, minutes, frac)
         return nmea_val, direction
 
     def _decimal_to_nmea_lon(self, lon):
@@ -50,20 +64,16 @@ class GGA:
         if lon is None: return "", ""
         
         direction = 'E' if lon >= 0 else 'W'
-        abs_lon = abs(lon)
-        degrees = int(abs_lon)
-        minutes = (abs_lon - degrees) * 60
-        # 格式化: 3位度数 + 2位整数分 + 小数分
-        nmea_val = f"{degrees:03d}{minutes:09.6f}"
+        micro_min = int(abs(lon) * 60_000_000 + 0.5)
+        degrees, rem = divmod(micro_min, 60_000_000)
+        minutes, frac = divmod(rem, 1_000_000)
+        # 格式化: 3位度数 + 2位整数分 + 6位小数分
+        nmea_val = "%03d%02d.%06d" % (degrees, minutes, frac)
         return nmea_val, direction
 
     def _format_time(self):
         """格式化时间为 hhmmss.ss"""
-        if self.utc_time is None:
-            return  datetime.datetime.now().time().strftime("%H%M%S.%f")[:9] # 保留两位毫秒
-        if isinstance(self.utc_time, (datetime.time, datetime.datetime)):
-            return self.utc_time.strftime("%H%M%S.%f")[:9] # 保留两位毫秒
-        return str(self.utc_time)
+        return _format_nmea_time(self.utc_time)
 
     def __str__(self):
         """生成最终的 NMEA 字符串"""
@@ -76,30 +86,75 @@ class GGA:
         # 2. 拼接数据体 (注意: 即使数据为空, 逗号也不能少)
         # 格式: ID,Time,Lat,NS,Lon,EW,Quality,NumSV,HDOP,Alt,M,Sep,M,Age,RefID
         # 头部 "$" 不参与校验和计算
-        payload = f"{self.talker}GGA,{time_str},{lat_str},{ns},{lon_str},{ew}," \
-                  f"{self.quality},{self.num_sats:02d},{self.hdop},{self.alt},M," \
-                  f"{self.geo_sep},M,{self.age_diff},{self.ref_id}"
+        payload = ",".join((
+            f"{self.talker}GGA", time_str, lat_str, ns, lon_str, ew,
+            str(self.quality), f"{self.num_sats:02d}", str(self.hdop), str(self.alt), "M",
+            str(self.geo_sep), "M", str(self.age_diff), str(self.ref_id),
+        ))
         
-        # 3. 计算校验和
-        cs = calculate_nmea_checksum(payload)
+        # 3. 计算校验和 (payload 不含 '$' 和 '*', 直接对字节做 XOR)
+        cs = _xor_checksum(payload.encode('ascii'))
         
         # 4. 返回完整语句
-        return f"${payload}*{cs}"
+        return f"${payload}*{cs:02X}"
+
+    def freeze(self):
+        """
+        固定除时间和经纬度以外的所有字段, 返回 emit(time_str, lat, lon) -> bytes。
+        
+        不变的头部/尾部字段只格式化一次, 并预先算好它们对校验和的 XOR 贡献,
+        每次 emit 只需格式化时间和经纬度。之后再修改实例的任何字段都不会影响 emit。
+        time_str 为 None 时使用 freeze 时的 utc_time (utc_time 为 None 则每次取当前时间)。
+        返回的 bytes 与 str(self) 编码后相同 (不含行尾的 \r\n)。
+        """
+        head = f"{self.talker}GGA,".encode('ascii')
+        tail = f",{self.quality},{self.num_sats:02d},{self.hdop},{self.alt},M," \
+               f"{self.geo_sep},M,{self.age_diff},{self.ref_id}".encode('ascii')
+        fixed_cs = _xor_checksum(head) ^ _xor_checksum(tail)
+        prefix = b"$" + head
+        utc_time = self.utc_time
+        to_nmea_lat = self._decimal_to_nmea_lat
+        to_nmea_lon = self._decimal_to_nmea_lon
+
+        def emit(time_str, lat, lon):
+            if time_str is None:
+                time_str = _format_nmea_time(utc_time)
+            lat_str, ns = to_nmea_lat(lat)
+            lon_str, ew = to_nmea_lon(lon)
+            body = f"{time_str},{lat_str},{ns},{lon_str},{ew}".encode('ascii')
+            cs = fixed_cs ^ _xor_checksum(body)
+            return b"%s%s%s*%02X" % (prefix, body, tail, cs)
+
+        return emit
+
+def _format_nmea_time(utc_time):
+    """格式化时间为 hhmmss.ss, utc_time 为 None 时取当前时间"""
+    if utc_time is None:
+        return  datetime.datetime.now().time().strftime("%H%M%S.%f")[:9] # 保留两位毫秒
+    if isinstance(utc_time, (datetime.time, datetime.datetime)):
+        return utc_time.strftime("%H%M%S.%f")[:9] # 保留两位毫秒
+    return str(utc_time)
 
 def calculate_nmea_checksum(sentence):
     """
     Calculates the 2-digit hexadecimal checksum for an NMEA string.
+    NMEA 0183 sentences are ASCII-only; raises ValueError for non-ASCII input.
     """
-    if sentence.startswith('$'):
-        sentence = sentence[1:]
-    if '*' in sentence:
-        sentence = sentence.split('*')[0]
+    try:
+        buf = sentence.encode('ascii')
+    except UnicodeEncodeError:
+        raise ValueError("NMEA sentence must contain only ASCII characters") from None
+    if buf[:1] == b'$':
+        buf = buf[1:]
+    end = buf.find(b'*')
+    if end >= 0:
+        buf = buf[:end]
 
-    checksum = 0
-    for char in sentence:
-        checksum ^= ord(char)
+    return f"{_xor_checksum(buf):02X}"
 
-    return hex(checksum)[2:].upper().zfill(2)
+def _xor_checksum(buf):
+    """XOR of all bytes in buf, folded in C rather than a Python loop."""
+    return functools.reduce(operator.xor, buf, 0)
 
 def validate_gga_message(sentence):
     """
@@ -115,31 +170,36 @@ def validate_gga_message(sentence):
         logger.warning(f"Format Error: Message must start with '$'. Input: {sentence[:10]}...")
         return False
         
-    if '*' not in sentence:
+    raw_content, sep, provided_checksum = sentence.partition('*')
+    if not sep:
         logger.warning("Format Error: Message missing checksum delimiter '*'.")
         return False
 
-    try:
-        raw_content, provided_checksum = sentence.split('*')
-    except ValueError:
+    if not sentence.isascii():
+        logger.warning("Format Error: Message contains non-ASCII characters.")
+        return False
+
+    if '*' in provided_checksum:
         logger.warning("Format Error: Message contains multiple asterisks or is malformed.")
         return False
 
-    # Verify Checksum
-    calculated = calculate_nmea_checksum(raw_content)
+    # Verify Checksum (everything between '$' and '*')
+    content_body = raw_content[1:] # Remove '$'
+    calculated = f"{_xor_checksum(content_body.encode('ascii')):02X}"
     if calculated != provided_checksum.upper():
         logger.warning(f"Checksum Mismatch: Calculated '{calculated}', Provided '{provided_checksum}'.")
         return False
 
     # --- LEVEL 2: Structure (Field Counts) ---
-    content_body = raw_content[1:] # Remove '$'
-    fields = content_body.split(',')
-
-    # GGA must have exactly 15 fields
-    if len(fields) != 15:
-        logger.warning(f"Structure Error: Expected 15 fields, found {len(fields)}.")
+    # GGA must have exactly 15 fields; count separators before allocating any field strings
+    num_fields = content_body.count(',') + 1
+    if num_fields != 15:
+        logger.warning(f"Structure Error: Expected 15 fields, found {num_fields}.")
         return False
 
+    # Separator count is already known, so cap the split at the 14 separators
+    fields = content_body.split(',', 14)
+
     # --- LEVEL 3: Content Format (Regex) ---
     
     # Field 0: Talker ID
@@ -148,12 +208,12 @@ def validate_gga_message(sentence):
         return False
 
     # Field 1: Time (HHMMSS.ss)
-    if fields[1] and not re.match(r'^\d{6}(\.\d+)?$', fields[1]):
+    if fields[1] and not _RE_TIME.match(fields[1]):
         logger.warning(f"Data Error: Invalid UTC Time format '{fields[1]}'.")
         return False
 
     # Field 2: Latitude (DDMM.MMMM)
-    if fields[2] and not re.match(r'^\d{4}\.\d+$', fields[2]):
+    if fields[2] and not _RE_LAT.match(fields[2]):
         logger.warning(f"Data Error: Invalid Latitude format '{fields[2]}'. Expected DDMM.MMMM.")
         return False
 
@@ -163,7 +223,7 @@ def validate_gga_message(sentence):
         return False
 
     # Field 4: Longitude (DDDMM.MMMM)
-    if fields[4] and not re.match(r'^\d{5}\.\d+$', fields[4]):
+    if fields[4] and not _RE_LON.match(fields[4]):
         logger.warning(f"Data Error: Invalid Longitude format '{fields[4]}'. Expected DDDMM.MMMM.")
         return False
 
@@ -173,7 +233,7 @@ def validate_gga_message(sentence):
         return False
 
     # Field 6: Fix Quality (0-8)
-    if not re.match(r'^[0-8]$', fields[6]):
+    if len(fields[6]) != 1 or fields[6] not in '012345678':
         logger.warning(f"Data Error: Invalid Fix Quality '{fields[6]}'.")
         return False
 
@@ -183,12 +243,12 @@ def validate_gga_message(sentence):
         return False
 
     # Field 8: HDOP
-    if fields[8] and not re.match(r'^\d+(\.\d+)?$', fields[8]):
+    if fields[8] and not _RE_POS_FLOAT.match(fields[8]):
         logger.warning(f"Data Error: Invalid HDOP '{fields[8]}'.")
         return False
 
     # Field 9 & 10: Altitude + Unit
-    if fields[9] and not re.match(r'^-?\d+(\.\d+)?$', fields[9]):
+    if fields[9] and not _RE_INT_OR_FLOAT.match(fields[9]):
         logger.warning(f"Data Error: Invalid Altitude '{fields[9]}'.")
         return False
     if fields[9] and fields[10] != 'M':
@@ -196,7 +256,7 @@ def validate_gga_message(sentence):
         return False
 
     # Field 11 & 12: Geoid + Unit
-    if fields[11] and not re.match(r'^-?\d+(\.\d+)?$', fields[11]):
+    if fields[11] and not _RE_INT_OR_FLOAT.match(fields[11]):
         logger.warning(f"Data Error: Invalid Geoid Separation '{fields[11]}'.")
         return False
     if fields[11] and fields[12] != 'M':
@@ -204,7 +264,7 @@ def validate_gga_message(sentence):
         return False
 
     # Field 13: Age of DGPS
-    if fields[13] and not re.match(r'^\d+(\.\d+)?$', fields[13]):
+    if fields[13] and not _RE_POS_FLOAT.match(fields[13]):
         logger.warning(f"Data Error: Invalid DGPS Age '{fields[13]}'.")
         return False
 
@@ -3,68 +3,223 @@ import sys
 import os
 import time
 import argparse  # 引入参数解析库
+import multiprocessing as mp
+import selectors
+import signal
+from array import array
 
-from fgga import GGA,get_random_displacement_components,get_new_coordinates
-import threading
+try:
+    # 优先使用 libyaml 的 C 实现解析
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
 
+from fgga import GGA,get_random_displacement_components,get_new_coordinates_vec,make_stepper
 
+try:
+    import numpy as np
+except ImportError:  # 没有 numpy 时逐点计算
+    np = None
 
-def stdin_reader_thread():
-    """后台线程：负责从标准输入读取二进制数据"""
+# 每批预计算的轨迹点数
+TRACK_BATCH = 1000
+
+
+
+def open_stdin_selector():
+    """
+    注册标准输入用于非阻塞读取; 平台或输入类型不支持时返回 None。
+    (上游程序如 socat 可能会写入数据, 必须读走, 否则管道写满会阻塞对方)
+    """
+    if sys.stdin is None or sys.platform == "win32":
+        # Windows 上 select 只支持 socket
+        return None
+    sel = selectors.DefaultSelector()
     try:
-        # 获取二进制读取器
-        reader = sys.stdin.buffer
-        while True:
-            # 读取数据块（例如最大 1024 字节）
-            # 注意：read 会阻塞直到有数据
-            data = reader.read(1024)
-            
+        sel.register(sys.stdin.fileno(), selectors.EVENT_READ)
+    except (OSError, ValueError):
+        # 普通文件不能用 epoll 等待, 或者 stdin 已关闭
+        sel.close()
+        return None
+    return sel
+
+def sleep_draining_stdin(sel, delay):
+    """休眠 delay 秒, 期间把标准输入的数据读出并丢弃"""
+    if sel is None:
+        time.sleep(delay)
+        return
+    deadline = time.monotonic() + delay
+    while delay > 0:
+        for key, _ in sel.select(delay):
+            data = os.read(key.fd, 1024)
             if not data:
-                # 如果读取不到数据，说明管道已关闭
-                break
+                # 读取不到数据，说明管道已关闭, 之后只需要休眠
+                sel.unregister(key.fd)
             # process data??
+        delay = deadline - time.monotonic()
+
+def track_positions(lon, lat, dx, dy, batch=TRACK_BATCH):
+    """
+    按每步固定位移 (dx, dy) 做匀速直线运动, 无限生成后续的 (经度, 纬度)。
+    有 numpy 时每次批量预计算 batch 个点, 再逐个输出。
+    """
+    if np is None:
+        step = make_stepper(lon, lat)
+        while True:
+            yield step(dx, dy)
+
+    steps = np.arange(batch)
+    while True:
+        # 纬度增量恒定: 先得到每一步出发点的纬度
+        _, lat_from = get_new_coordinates_vec(0.0, lat, 0.0, dy * steps)
+        # 经度增量取决于出发点纬度, 累加后得到经度
+        d_lon, lat_to = get_new_coordinates_vec(0.0, lat_from, dx, dy)
+        lon_to = lon + np.cumsum(d_lon)
+        yield from zip(lon_to.tolist(), lat_to.tolist())
+        lon, lat = lon_to[-1].item(), lat_to[-1].item()
 
-    except Exception as e:
-        print(f"\n[Thread Error] {e}", file=sys.stderr)
+def open_output(path):
+    """
+    打开输出文件/设备, 返回文件描述符; path 为 None 时返回 stdout 的文件描述符。
+    (可以是普通文件, 也可以是设备, 如 socat 创建的 pty 链接)
+    """
+    if path is None:
+        return sys.stdout.fileno()
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_NOCTTY', 0)
+    return os.open(path, flags, 0o644)
+
+def run_receiver(cfg, out_fd=None, stdin_sel=None):
+    """
+    模拟一个接收机: 从 cfg 的起点按固定位移匀速直线运动, 每个间隔输出一条 GGA。
+    cfg 包含 lon, lat, dx, dy, interval, output (输出路径, None 为 stdout)。
+    out_fd 为已打开的输出 (由调用方关闭); 为 None 时按 cfg['output'] 自行打开并在结束时关闭。
+    stdin_sel 见 open_stdin_selector, 为 None 时只休眠。
+    """
+    interval = cfg['interval']
+    track = track_positions(cfg['lon'], cfg['lat'], cfg['dx'], cfg['dy'])
+    # 循环中只有时间和经纬度会变化, 其余字段预先格式化
+    emit = GGA().freeze()
+
+    own_fd = out_fd is None
+    if own_fd:
+        out_fd = open_output(cfg['output'])
+    # 按单调时钟上的截止时间调度, 生成/输出的耗时不会累积成频率漂移
+    next_t = time.monotonic()
+    try:
+        for n_lon, n_lat in track:
+            # 一次 os.write 直接写文件描述符, 绕过文本层, 也无需 flush
+            os.write(out_fd, emit(None, n_lat, n_lon) + b"\r\n")
+            
+            # 休眠到下一个截止时间; 已经超时则从当前时刻重新计时
+            next_t += interval
+            delay = next_t - time.monotonic()
+            if delay > 0:
+                sleep_draining_stdin(stdin_sel, delay)
+            else:
+                next_t = time.monotonic()
+            
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if own_fd and cfg['output'] is not None:
+            os.close(out_fd)
+
+def _raise_keyboard_interrupt(signum, frame):
+    """SIGTERM/SIGHUP (如 socat 结束 EXEC 子进程时) 按 Ctrl-C 处理, 走同样的退出流程"""
+    raise KeyboardInterrupt
+
+def run_receivers(cfgs, out_fds, stdin_sel, poll):
+    """
+    每个接收机一个进程, 等待它们结束; 返回异常退出的接收机编号列表。
+    有接收机异常退出或主进程被中断时, 结束并回收其余的子进程。
+    """
+    if "fork" in mp.get_all_start_methods():
+        # 子进程直接继承主进程已打开的输出
+        ctx = mp.get_context("fork")
+    else:
+        # 不能继承文件描述符 (Windows), 子进程按路径重新打开
+        ctx = mp.get_context()
+        out_fds = [None] * len(cfgs)
+    procs = [ctx.Process(target=run_receiver, args=(cfg, fd), daemon=True)
+             for cfg, fd in zip(cfgs, out_fds)]
+    failed = []
+    try:
+        for p in procs:
+            p.start()
+        # 子进程的 stdin 被 multiprocessing 重定向到 /dev/null, 由主进程负责读走 stdin
+        while not failed and any(p.is_alive() for p in procs):
+            sleep_draining_stdin(stdin_sel, poll)
+            failed = [i for i, p in enumerate(procs, 1) if p.exitcode not in (None, 0)]
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+        for p in procs:
+            if p.pid is not None:
+                p.join()
+    return failed
+
+def _float_array(values):
+    """把浮点数列表存为连续数组 (有 numpy 时为 ndarray, 否则为 array('d'))"""
+    if np is None:
+        return array('d', values)
+    return np.fromiter(values, dtype=np.float64, count=len(values))
 
 class LocationManager:
     def __init__(self, yaml_content):
+        # 按列存储 (SoA): 名称列表 + 经度/纬度/高度数组, 以及 小写名称 -> 下标
+        self.names = []
+        self.lon = self.lat = self.h = _float_array([])
+        self._idx = {}
         try:
             # 加载 YAML 数据
-            self.raw_list = yaml.safe_load(yaml_content)
-            if self.raw_list is None:
-                self.raw_list = []
-
-            self.locations = {}
-            for item in self.raw_list:
-                if 'name' in item:
-                    key = str(item['name']).lower()
-                    self.locations[key] = item
+            raw_list = yaml.load(yaml_content, Loader=SafeLoader)
+            if raw_list is None:
+                raw_list = []
+
+            # 逐条检查, 字段缺失或无效的地点单独跳过, 不影响其他地点
+            names, lon, lat, h = [], [], [], []
+            for item in raw_list:
+                if not isinstance(item, dict) or 'name' not in item:
+                    continue
+                try:
+                    item_lon = float(item['longitude'])
+                    item_lat = float(item['latitude'])
+                    height = item.get('height')
+                    item_h = 1.0 if height is None else float(height)
+                except (KeyError, TypeError, ValueError) as e:
+                    print(f"跳过地点 '{item['name']}': 字段缺失或无效 ({e!r})", file=sys.stderr)
+                    continue
+                names.append(item['name'])
+                lon.append(item_lon)
+                lat.append(item_lat)
+                h.append(item_h)
+
+            self.names = names
+            self.lon, self.lat, self.h = _float_array(lon), _float_array(lat), _float_array(h)
+            self._idx = {str(name).lower(): k for k, name in enumerate(names)}
             
         except yaml.YAMLError as exc:
             print(f"YAML 解析错误: {exc}")
-            self.locations = {}
         except Exception as e:
             print(f"加载错误: {e}")
-            self.locations = {}
 
     def list_locations(self):
         """列出所有可用的地点名称 (返回原始大小写名称)"""
-        return [data['name'] for data in self.locations.values()]
+        return [self.names[k] for k in self._idx.values()]
 
     def get_location_info(self, name):
         """根据名称获取经纬度和高度 (忽略大小写)"""
         if name is None:
             return None
             
-        key = str(name).lower()
+        k = self._idx.get(str(name).lower())
         
-        if key in self.locations:
-            data = self.locations[key]
+        if k is not None:
             return {
-                "lon": data['longitude'],
-                "lat": data['latitude'],
-                "h": data.get('height',1.0)
+                "lon": float(self.lon[k]),
+                "lat": float(self.lat[k]),
+                "h": float(self.h[k])
             }
         else:
             return None
@@ -72,6 +227,9 @@ class LocationManager:
 # --- 主程序逻辑 ---
 
 if __name__ == "__main__":
+    # PyInstaller 打包后在 Windows 上启动子进程需要
+    mp.freeze_support()
+
     # 定义命令行参数
     parser = argparse.ArgumentParser(description="GNSS GGA 模拟生成器")
     
@@ -83,8 +241,14 @@ if __name__ == "__main__":
     parser.add_argument("-c", "--config", default="locations.yml", help="Location 配置文件路径 (默认: locations.yml)")
     parser.add_argument("-t", "--interval", type=float, default=1.0, help="输出/Sleep 间隔时间，单位秒 (默认: 1.0)")
     parser.add_argument("-s", "--speed", type=float, default=1.0, help="移动速度，单位 m/s (默认: 1.0)")
+    parser.add_argument("-n", "--receivers", type=int, default=1, help="模拟的接收机数量, 每个接收机一个进程 (默认: 1)")
+    parser.add_argument("-o", "--output", help="输出文件/设备路径 (默认: stdout); 多个接收机时必须指定, 用 {} 表示接收机编号, 如 /tmp/ttyV{}")
 
     args = parser.parse_args()
+    if args.receivers < 1:
+        parser.error("--receivers 必须 >= 1")
+    if args.receivers > 1 and (not args.output or "{}" not in args.output):
+        parser.error("多个接收机时必须用 --output 指定包含 {} 的路径, 以区分每个接收机的输出")
     # 1. 初始化管理器
     try:
         with open("locations.yml", "r", encoding="utf-8") as f:
@@ -123,31 +287,42 @@ if __name__ == "__main__":
     step_distance = args.speed * args.interval
     
     # 获取位移分量 (根据原来的逻辑，这里生成一次方向后保持匀速直线运动)
-    # 如果希望随机漫步，应将此行放入 while 循环内
-    dx, dy = get_random_displacement_components(step_distance)
-    
-    n_lon = lon
-    n_lat = lat
-    g = GGA()
+    # 如果希望随机漫步，应将此行放入 run_receiver 的循环内
+    cfgs = []
+    for i in range(1, args.receivers + 1):
+        # 每个接收机随机一个方向, 在主进程里生成以免子进程继承相同的随机状态
+        dx, dy = get_random_displacement_components(step_distance)
+        cfgs.append({
+            "lon": lon, "lat": lat, "dx": dx, "dy": dy, "interval": args.interval,
+            "output": args.output.replace("{}", str(i)) if args.output else None,
+        })
 
-    reader_t = threading.Thread(target=stdin_reader_thread, daemon=True)
-    reader_t.start()
+    # 在启动接收机之前打开所有输出, 路径无效时立即报错退出
+    out_fds = []
     try:
-        while True:
-            # 更新坐标
-            n_lon, n_lat = get_new_coordinates(n_lon, n_lat, dx, dy)
-            
-            g.lat = n_lat
-            g.lon = n_lon
-            # 注意：如果 GGA 类支持高度设置，建议也加上 g.h = h
-            
-            # 输出到 stdout 并flush
-            sys.stdout.write(str(g))
-            sys.stdout.write("\r\n")
-            sys.stdout.flush()
-            
-            # 休眠指定间隔
-            time.sleep(args.interval)
-            
+        for cfg in cfgs:
+            out_fds.append(open_output(cfg['output']))
+    except OSError as e:
+        print(f"错误：无法打开输出 '{e.filename}': {e.strerror}", file=sys.stderr)
+        sys.exit(1)
+
+    signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, _raise_keyboard_interrupt)
+
+    stdin_sel = open_stdin_selector()
+    failed = []
+    try:
+        if args.receivers == 1:
+            run_receiver(cfgs[0], out_fds[0], stdin_sel)
+        else:
+            failed = run_receivers(cfgs, out_fds, stdin_sel, min(args.interval, 1.0))
     except KeyboardInterrupt:
-        sys.exit(0)
\ No newline at end of file
+        sys.exit(0)
+    finally:
+        for cfg, fd in zip(cfgs, out_fds):
+            if cfg['output'] is not None:
+                os.close(fd)
+    if failed:
+        print(f"错误：接收机 {', '.join(map(str, failed))} 异常退出", file=sys.stderr)
+        sys.exit(1)